@@ -11,7 +11,7 @@ GROUP BY v.VehicleType;
 
 SELECT r.Surface, AVG(f.SeverityScore) as AvgSeverity 
 FROM Fact_Accidents f 
-JOIN Dim_RoadCondition r ON f.RoadConditionID = r.ConditionID 
+JOIN Dim_RoadCondition r ON f.RoadConditionID = r.RoadConditionID 
 WHERE r.Surface = 'Snowy' 
 GROUP BY r.Surface;	
 
@@ -38,7 +38,7 @@ ORDER BY d.Month;
 SELECT v.VehicleType, COUNT(*) as AccidentCount 
 FROM Fact_Accidents f 
 JOIN Dim_Vehicle v ON f.VehicleID = v.VehicleID 
-JOIN Dim_RoadCondition r ON f.RoadConditionID = r.ConditionID 
+JOIN Dim_RoadCondition r ON f.RoadConditionID = r.RoadConditionID 
 WHERE r.Visibility = 'Rainy' 
 GROUP BY v.VehicleType;	
 
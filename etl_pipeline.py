@@ -1,9 +1,11 @@
 import pandas as pd
-from sqlalchemy import create_engine
+import numpy as np
+from sqlalchemy import create_engine, event
 from sqlalchemy.sql import text  # For wrapping raw SQL statements in SQLAlchemy
-import random
 import logging
+from concurrent.futures import ThreadPoolExecutor
 import os
+from generate_snapshots import generate_snapshots
 
 # Initialize logging to both file and console for debugging and auditing
 logging.basicConfig(
@@ -15,6 +17,16 @@ logging.basicConfig(
     ]
 )
 
+# Shared to_sql options: append into the tables from create_tables (keeping their keys)
+# using multi-row VALUES inserts instead of one INSERT per row
+BULK_KW = dict(if_exists='append', index=False, method='multi')
+# Stay below SQLite's default limit of 999 bound parameters per statement
+SQLITE_MAX_PARAMS = 900
+# Severity levels in score order, so SeverityScore is the category code + 1 (Minor=1, Moderate=2, Severe=3)
+SEVERITY_DTYPE = pd.CategoricalDtype(['Minor', 'Moderate', 'Severe'], ordered=True)
+# Seed for the random VehicleID/RoadConditionID assignment so repeated runs build the same warehouse
+RANDOM_SEED = 42
+
 # --- Data Loading ---
 
 def load_excel_file(file_path, required_sheets):
@@ -35,22 +47,23 @@ def load_excel_file(file_path, required_sheets):
     try:
         # Check if the Excel file exists
         if not os.path.exists(file_path):
-            logging.error(f"Excel file not found: {file_path}")
+            logging.error("Excel file not found: %s", file_path)
             raise FileNotFoundError(f"Excel file not found: {file_path}")
         
         # Load the Excel file and check for required sheets
-        excel_data = pd.ExcelFile(file_path)
-        missing_sheets = [sheet for sheet in required_sheets if sheet not in excel_data.sheet_names]
-        if missing_sheets:
-            logging.error(f"Missing required sheets: {missing_sheets}")
-            raise ValueError(f"Missing required sheets: {missing_sheets}")
-        
-        # Load each required sheet into a DataFrame
-        data = {sheet: pd.read_excel(file_path, sheet_name=sheet) for sheet in required_sheets}
+        # (calamine parses faster than openpyxl, and Arrow-backed columns use less memory)
+        with pd.ExcelFile(file_path, engine='calamine') as excel_data:
+            missing_sheets = [sheet for sheet in required_sheets if sheet not in excel_data.sheet_names]
+            if missing_sheets:
+                logging.error("Missing required sheets: %s", missing_sheets)
+                raise ValueError(f"Missing required sheets: {missing_sheets}")
+            
+            # Load all required sheets from the already-opened workbook in one call
+            data = pd.read_excel(excel_data, sheet_name=required_sheets, dtype_backend='pyarrow')
         logging.info("Excel file loaded successfully with all required sheets.")
         return data
     except Exception as e:
-        logging.error(f"Error loading Excel file: {str(e)}")
+        logging.error("Error loading Excel file: %s", e)
         raise
 
 # --- Data Transformation Utilities ---
@@ -72,205 +85,309 @@ def convert_timestamps(df, column):
     try:
         # Convert the column to datetime, coercing invalid values to NaT
         df[column] = pd.to_datetime(df[column], errors='coerce')
-        logging.info(f"Converted {column} to datetime in DataFrame.")
+        logging.info("Converted %s to datetime in DataFrame.", column)
         return df
     except Exception as e:
-        logging.error(f"Error converting timestamps in {column}: {str(e)}")
+        logging.error("Error converting timestamps in %s: %s", column, e)
         raise
 
+def bulk_chunksize(df):
+    """
+    Compute the largest to_sql chunksize that keeps a multi-row INSERT within SQLite's parameter limit.
+
+    Args:
+        df (pd.DataFrame): DataFrame about to be written.
+
+    Returns:
+        int: Number of rows per INSERT statement.
+    """
+    return max(1, SQLITE_MAX_PARAMS // len(df.columns))
+
+def draw_dimension_keys(rng, keys, size):
+    """
+    Draw random surrogate keys from those present in a dimension table.
+
+    Args:
+        rng (np.random.Generator): Seeded random generator.
+        keys (pd.Series): Surrogate keys of the dimension table.
+        size (int): Number of keys to draw.
+
+    Returns:
+        pd.arrays.IntegerArray: Nullable Int32 keys, all missing if the dimension is empty.
+    """
+    if len(keys) == 0:
+        return pd.array([pd.NA] * size, dtype='Int32')
+    return pd.array(rng.choice(keys.to_numpy(), size=size), dtype='Int32')
+
 # --- Database Setup ---
 
-def create_tables(engine):
+def configure_sqlite(engine):
     """
-    Create the database tables for the star schema in the SQLite database.
+    Apply foreign key enforcement and bulk-load PRAGMAs to every SQLite connection opened by the engine.
+
+    WAL journaling with synchronous=OFF avoids an fsync per statement during the
+    load. Without those syncs an OS crash or power loss can corrupt the database
+    file, so the load transaction only protects against errors raised by the
+    pipeline itself. That is acceptable because the warehouse is rebuilt from
+    Traffic.xlsx on every run.
+
+    Transactions are begun explicitly so that DDL runs inside them: by default the
+    pysqlite driver only opens a transaction before DML, and DROP/CREATE TABLE
+    would commit on their own.
 
     Args:
         engine (sqlalchemy.engine.Engine): SQLAlchemy engine for database connection.
+    """
+    @event.listens_for(engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        # PRAGMAs are per-connection, so apply them whenever the pool opens one
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA foreign_keys=ON")  # Not enabled by default in SQLite
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=OFF")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.execute("PRAGMA cache_size=-200000")  # Negative value is in KiB (~200 MB)
+        cursor.close()
+        # Disable the driver's implicit transaction handling; BEGIN is emitted below
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(engine, "begin")
+    def begin_transaction(conn):
+        conn.exec_driver_sql("BEGIN")
+
+def create_tables(conn):
+    """
+    Create the database tables for the star schema in the SQLite database.
+
+    Any existing tables are dropped first so every run loads into the schema defined here.
+    Only primary keys are declared; secondary indexes are built by create_indexes after the load.
+
+    Args:
+        conn (sqlalchemy.engine.Connection): Active connection of the shared load transaction,
+            so a failed load rolls back to the previous warehouse.
 
     Raises:
         Exception: If table creation fails.
     """
     try:
-        with engine.connect() as conn:
-            # Enable foreign key enforcement in SQLite (not enabled by default)
-            conn.execute(text("PRAGMA foreign_keys = ON"))
-
-            # Create Dim_Location table with LocationID as primary key and unique LocationName
-            conn.execute(text('''
-                CREATE TABLE IF NOT EXISTS Dim_Location (
-                    LocationID INTEGER PRIMARY KEY,
-                    LocationName VARCHAR(255) UNIQUE
-                )
-            '''))
-
-            # Create Dim_Vehicle table with VehicleID as primary key
-            conn.execute(text('''
-                CREATE TABLE IF NOT EXISTS Dim_Vehicle (
-                    VehicleID INTEGER PRIMARY KEY,
-                    VehicleType VARCHAR(100)
-                )
-            '''))
-
-            # Create Dim_RoadCondition table with RoadConditionID as primary key
-            conn.execute(text('''
-                CREATE TABLE IF NOT EXISTS Dim_RoadCondition (
-                    RoadConditionID INTEGER PRIMARY KEY,
-                    Surface VARCHAR(50),
-                    Visibility VARCHAR(50)
-                )
-            '''))
-
-            # Create Dim_Date table with DateID as primary key
-            conn.execute(text('''
-                CREATE TABLE IF NOT EXISTS Dim_Date (
-                    DateID INTEGER PRIMARY KEY,
-                    Date DATE,
-                    Month INTEGER,
-                    Year INTEGER,
-                    Time TIMESTAMP
-                )
-            '''))
-
-            # Create Fact_Accidents table with foreign keys to dimension tables
-            conn.execute(text('''
-                CREATE TABLE IF NOT EXISTS Fact_Accidents (
-                    AccidentID INTEGER PRIMARY KEY,
-                    DateID INTEGER,
-                    LocationID INTEGER,
-                    VehicleID INTEGER,
-                    RoadConditionID INTEGER,
-                    VehiclesInvolved INTEGER,
-                    SeverityScore INTEGER,
-                    FOREIGN KEY (DateID) REFERENCES Dim_Date(DateID),
-                    FOREIGN KEY (LocationID) REFERENCES Dim_Location(LocationID),
-                    FOREIGN KEY (VehicleID) REFERENCES Dim_Vehicle(VehicleID),
-                    FOREIGN KEY (RoadConditionID) REFERENCES Dim_RoadCondition(RoadConditionID)
-                )
-            '''))
+        # Drop tables from previous runs, fact table first so no foreign keys dangle
+        for table in ['Fact_Accidents', 'Dim_Location', 'Dim_Vehicle', 'Dim_RoadCondition', 'Dim_Date']:
+            conn.execute(text(f"DROP TABLE IF EXISTS {table}"))
+
+        # Create Dim_Location table with LocationID as primary key
+        # (uniqueness of LocationName is enforced by an index created after the load)
+        conn.execute(text('''
+            CREATE TABLE IF NOT EXISTS Dim_Location (
+                LocationID INTEGER PRIMARY KEY,
+                LocationName VARCHAR(255)
+            )
+        '''))
+
+        # Create Dim_Vehicle table with VehicleID as primary key
+        conn.execute(text('''
+            CREATE TABLE IF NOT EXISTS Dim_Vehicle (
+                VehicleID INTEGER PRIMARY KEY,
+                VehicleType VARCHAR(100)
+            )
+        '''))
+
+        # Create Dim_RoadCondition table with RoadConditionID as primary key
+        conn.execute(text('''
+            CREATE TABLE IF NOT EXISTS Dim_RoadCondition (
+                RoadConditionID INTEGER PRIMARY KEY,
+                Surface VARCHAR(50),
+                Visibility VARCHAR(50)
+            )
+        '''))
+
+        # Create Dim_Date table with DateID as primary key
+        conn.execute(text('''
+            CREATE TABLE IF NOT EXISTS Dim_Date (
+                DateID INTEGER PRIMARY KEY,
+                Date DATE,
+                Month INTEGER,
+                Year INTEGER,
+                Time TIMESTAMP
+            )
+        '''))
+
+        # Create Fact_Accidents table with foreign keys to dimension tables
+        conn.execute(text('''
+            CREATE TABLE IF NOT EXISTS Fact_Accidents (
+                AccidentID INTEGER PRIMARY KEY,
+                DateID INTEGER,
+                LocationID INTEGER,
+                VehicleID INTEGER,
+                RoadConditionID INTEGER,
+                VehiclesInvolved INTEGER,
+                SeverityScore INTEGER,
+                FOREIGN KEY (DateID) REFERENCES Dim_Date(DateID),
+                FOREIGN KEY (LocationID) REFERENCES Dim_Location(LocationID),
+                FOREIGN KEY (VehicleID) REFERENCES Dim_Vehicle(VehicleID),
+                FOREIGN KEY (RoadConditionID) REFERENCES Dim_RoadCondition(RoadConditionID)
+            )
+        '''))
 
         logging.info("Database tables created successfully.")
     except Exception as e:
-        logging.error(f"Error creating database tables: {str(e)}")
+        logging.error("Error creating database tables: %s", e)
+        raise
+
+def create_indexes(conn):
+    """
+    Create secondary indexes once the bulk load is complete.
+
+    Building each index in one pass over the loaded table is cheaper than maintaining
+    the b-tree on every inserted row.
+
+    Args:
+        conn (sqlalchemy.engine.Connection): Active connection of the shared load transaction.
+
+    Raises:
+        Exception: If index creation fails.
+    """
+    try:
+        # Enforce unique location names now that Dim_Location is populated
+        conn.execute(text("CREATE UNIQUE INDEX IF NOT EXISTS idx_dim_location_name ON Dim_Location (LocationName)"))
+
+        # Index the fact table's foreign keys for the dimension joins in the analysis queries
+        conn.execute(text("CREATE INDEX IF NOT EXISTS idx_fact_location_date ON Fact_Accidents (LocationID, DateID)"))
+        conn.execute(text("CREATE INDEX IF NOT EXISTS idx_fact_date ON Fact_Accidents (DateID)"))
+        conn.execute(text("CREATE INDEX IF NOT EXISTS idx_fact_vehicle ON Fact_Accidents (VehicleID)"))
+        conn.execute(text("CREATE INDEX IF NOT EXISTS idx_fact_road_condition ON Fact_Accidents (RoadConditionID)"))
+
+        logging.info("Database indexes created successfully.")
+    except Exception as e:
+        logging.error("Error creating database indexes: %s", e)
+        raise
+
+def load_table(df, table_name, conn):
+    """
+    Load a DataFrame into an existing table using batched multi-row inserts.
+
+    Args:
+        df (pd.DataFrame): DataFrame to load.
+        table_name (str): Name of the target table created by create_tables.
+        conn (sqlalchemy.engine.Connection): Active connection of the shared load transaction.
+
+    Raises:
+        Exception: If loading fails.
+    """
+    try:
+        df.to_sql(table_name, con=conn, chunksize=bulk_chunksize(df), **BULK_KW)
+        logging.info("Populated %s with %d rows.", table_name, len(df))
+    except Exception as e:
+        logging.error("Error populating %s: %s", table_name, e)
         raise
 
-# --- Dimension Table Population ---
+# --- Dimension Table Construction ---
 
-def populate_dim_location(accidents_df, engine):
+def build_dim_location(accidents_df):
     """
-    Populate the Dim_Location table with unique locations from the Accidents data.
+    Build the Dim_Location DataFrame from unique locations in the Accidents data.
 
     Args:
         accidents_df (pd.DataFrame): DataFrame containing accident data.
-        engine (sqlalchemy.engine.Engine): SQLAlchemy engine for database connection.
 
     Returns:
-        pd.DataFrame: Populated Dim_Location DataFrame.
+        pd.DataFrame: Dim_Location DataFrame.
 
     Raises:
-        Exception: If population fails.
+        Exception: If the build fails.
     """
     try:
-        # Extract unique locations and assign surrogate keys
+        # Extract unique locations once and assign surrogate keys
+        locs = accidents_df['Location'].dropna().unique()
         dim_location_df = pd.DataFrame({
-            'LocationID': range(1, len(accidents_df['Location'].unique()) + 1),
-            'LocationName': accidents_df['Location'].unique()
+            'LocationID': np.arange(1, len(locs) + 1, dtype='int32'),
+            'LocationName': locs
         })
-        # Load the DataFrame into the Dim_Location table
-        dim_location_df.to_sql('Dim_Location', engine, if_exists='replace', index=False)
-        logging.info("Populated Dim_Location with %d rows.", len(dim_location_df))
         return dim_location_df
     except Exception as e:
-        logging.error(f"Error populating Dim_Location: {str(e)}")
+        logging.error("Error building Dim_Location: %s", e)
         raise
 
-def populate_dim_vehicle(vehicles_df, engine):
+def build_dim_vehicle(vehicles_df):
     """
-    Populate the Dim_Vehicle table with vehicle data.
+    Build the Dim_Vehicle DataFrame from vehicle data.
 
     Args:
         vehicles_df (pd.DataFrame): DataFrame containing vehicle data.
-        engine (sqlalchemy.engine.Engine): SQLAlchemy engine for database connection.
 
     Returns:
-        pd.DataFrame: Populated Dim_Vehicle DataFrame.
+        pd.DataFrame: Dim_Vehicle DataFrame.
 
     Raises:
-        Exception: If population fails.
+        Exception: If the build fails.
     """
     try:
-        # Select relevant columns and remove rows with missing values
-        dim_vehicle_df = vehicles_df[['VehicleID', 'VehicleType']].dropna()
-        # Load the DataFrame into the Dim_Vehicle table
-        dim_vehicle_df.to_sql('Dim_Vehicle', engine, if_exists='replace', index=False)
-        logging.info("Populated Dim_Vehicle with %d rows.", len(dim_vehicle_df))
+        # Select relevant columns, remove rows with missing values and downcast
+        dim_vehicle_df = vehicles_df[['VehicleID', 'VehicleType']].dropna().astype({
+            'VehicleID': 'int32',
+            'VehicleType': 'category'
+        })
         return dim_vehicle_df
     except Exception as e:
-        logging.error(f"Error populating Dim_Vehicle: {str(e)}")
+        logging.error("Error building Dim_Vehicle: %s", e)
         raise
 
-def populate_dim_road_condition(road_conditions_df, engine):
+def build_dim_road_condition(road_conditions_df):
     """
-    Populate the Dim_RoadCondition table with road condition data.
+    Build the Dim_RoadCondition DataFrame from road condition data.
 
     Args:
         road_conditions_df (pd.DataFrame): DataFrame containing road condition data.
-        engine (sqlalchemy.engine.Engine): SQLAlchemy engine for database connection.
 
     Returns:
-        pd.DataFrame: Populated Dim_RoadCondition DataFrame.
+        pd.DataFrame: Dim_RoadCondition DataFrame.
 
     Raises:
-        Exception: If population fails.
+        Exception: If the build fails.
     """
     try:
-        # Select relevant columns and remove rows with missing values
-        dim_road_condition_df = road_conditions_df[['ConditionID', 'Surface', 'Visibility']].dropna()
-        # Load the DataFrame into the Dim_RoadCondition table
-        dim_road_condition_df.to_sql('Dim_RoadCondition', engine, if_exists='replace', index=False)
-        logging.info("Populated Dim_RoadCondition with %d rows.", len(dim_road_condition_df))
+        # Select relevant columns, remove rows with missing values and downcast
+        dim_road_condition_df = road_conditions_df[['ConditionID', 'Surface', 'Visibility']].dropna().astype({
+            'ConditionID': 'int32',
+            'Surface': 'category',
+            'Visibility': 'category'
+        }).rename(columns={'ConditionID': 'RoadConditionID'})  # Match the Dim_RoadCondition schema
         return dim_road_condition_df
     except Exception as e:
-        logging.error(f"Error populating Dim_RoadCondition: {str(e)}")
+        logging.error("Error building Dim_RoadCondition: %s", e)
         raise
 
-def populate_dim_date(accidents_df, engine):
+def build_dim_date(accidents_df):
     """
-    Populate the Dim_Date table with unique dates from the Accidents data.
+    Build the Dim_Date DataFrame from unique dates in the Accidents data.
 
     Args:
         accidents_df (pd.DataFrame): DataFrame containing accident data.
-        engine (sqlalchemy.engine.Engine): SQLAlchemy engine for database connection.
 
     Returns:
-        pd.DataFrame: Populated Dim_Date DataFrame.
+        pd.DataFrame: Dim_Date DataFrame.
 
     Raises:
-        Exception: If population fails.
+        Exception: If the build fails.
     """
     try:
         # Extract unique dates (not timestamps) and create date components
-        # Keep the full datetime, but we'll group by date to get unique dates
-        unique_dates = pd.to_datetime(accidents_df['ReportedAt']).dt.date.drop_duplicates()
-        # Convert back to datetime64 for proper .dt accessor usage
-        unique_dates_dt = pd.to_datetime(unique_dates)
+        # ReportedAt is already datetime64 (see convert_timestamps), so truncate to midnight directly
+        unique_dates_dt = accidents_df['ReportedAt'].dt.normalize().dropna().drop_duplicates()
         dim_date_df = pd.DataFrame({
-            'DateID': range(1, len(unique_dates) + 1),
-            'Date': unique_dates,
+            'DateID': range(1, len(unique_dates_dt) + 1),
+            'Date': unique_dates_dt.dt.date,
             'Month': unique_dates_dt.dt.month,
             'Year': unique_dates_dt.dt.year,
             'Time': unique_dates_dt  # Use the datetime as the Time column
-        })
-        # Load the DataFrame into the Dim_Date table
-        dim_date_df.to_sql('Dim_Date', engine, if_exists='replace', index=False)
-        logging.info("Populated Dim_Date with %d rows.", len(dim_date_df))
+        }).astype({'DateID': 'int32', 'Month': 'int8', 'Year': 'int16'})
         return dim_date_df
     except Exception as e:
-        logging.error(f"Error populating Dim_Date: {str(e)}")
+        logging.error("Error building Dim_Date: %s", e)
         raise
 
 # --- Fact Table Population ---
 
-def populate_fact_accidents(accidents_df, dim_location_df, dim_date_df, road_conditions_df, engine):
+def populate_fact_accidents(accidents_df, dim_location_df, dim_date_df, dim_vehicle_df, dim_road_condition_df, road_conditions_df, conn):
     """
     Populate the Fact_Accidents table by joining Accidents data with dimension tables.
 
@@ -278,94 +395,118 @@ def populate_fact_accidents(accidents_df, dim_location_df, dim_date_df, road_con
         accidents_df (pd.DataFrame): DataFrame containing accident data.
         dim_location_df (pd.DataFrame): Dim_Location DataFrame.
         dim_date_df (pd.DataFrame): Dim_Date DataFrame.
+        dim_vehicle_df (pd.DataFrame): Dim_Vehicle DataFrame.
+        dim_road_condition_df (pd.DataFrame): Dim_RoadCondition DataFrame.
         road_conditions_df (pd.DataFrame): DataFrame containing road condition data.
-        engine (sqlalchemy.engine.Engine): SQLAlchemy engine for database connection.
+        conn (sqlalchemy.engine.Connection): Active connection of the shared load transaction.
 
     Raises:
         Exception: If population fails.
     """
     try:
+        # Store Severity as a categorical of the known levels; unknown values become NaN (code -1)
+        accidents_df['Severity'] = accidents_df['Severity'].astype(SEVERITY_DTYPE)
+
         # Debug: Check for unmatched locations between Accidents and Conditions
         accident_locations = set(accidents_df['Location'].unique())
         condition_locations = set(road_conditions_df['Location'].unique())
         unmatched_locations = accident_locations - condition_locations
         if unmatched_locations:
-            logging.warning(f"Locations in Accidents not found in Conditions: {unmatched_locations}")
-
-        # Precompute DateID by merging with Dim_Date
-        accidents_df['ReportedAt_Date'] = accidents_df['ReportedAt'].dt.date
-        # Do not convert dim_date_df['Date'] to string; keep it as datetime.date
-        accidents_with_date = accidents_df.merge(
-            dim_date_df[['DateID', 'Date']],
-            left_on='ReportedAt_Date',
-            right_on='Date',
-            how='left'
+            logging.warning("Locations in Accidents not found in Conditions: %s", unmatched_locations)
+
+        # Precompute DateID by binary search over the Dim_Date dates (midnight timestamps in 'Time');
+        # DateIDs follow first appearance rather than date order, so search through an argsort
+        dim_dates = dim_date_df['Time'].to_numpy(dtype='datetime64[ns]')
+        date_order = np.argsort(dim_dates)
+        accident_dates = accidents_df['ReportedAt'].dt.normalize().to_numpy(dtype='datetime64[ns]')
+        if len(dim_dates) > 0:
+            positions = date_order[np.searchsorted(dim_dates, accident_dates, sorter=date_order).clip(max=len(dim_dates) - 1)]
+            date_matched = dim_dates[positions] == accident_dates  # NaT never compares equal
+            date_ids = np.where(date_matched, dim_date_df['DateID'].to_numpy()[positions], np.nan)
+        else:
+            # Dim_Date is empty when every ReportedAt was coerced to NaT, so nothing can match
+            date_matched = np.zeros(len(accident_dates), dtype=bool)
+            date_ids = np.full(len(accident_dates), np.nan)
+
+        # Precompute LocationID with a dictionary lookup into Dim_Location
+        loc_to_id = dict(zip(dim_location_df['LocationName'], dim_location_df['LocationID']))
+        accidents_with_location = accidents_df.assign(
+            DateID=date_ids,
+            LocationID=accidents_df['Location'].map(loc_to_id)
         )
-        # Log any unmatched dates for debugging
-        unmatched_dates = accidents_with_date[accidents_with_date['DateID'].isnull()]['ReportedAt_Date'].unique()
+        # Log any unmatched dates for debugging (missing ReportedAt values are reported as skipped below)
+        unmatched_dates = accidents_df.loc[~date_matched & accidents_df['ReportedAt'].notna(), 'ReportedAt'].dt.date.unique()
         if len(unmatched_dates) > 0:
-            logging.warning(f"Unmatched dates in Fact_Accidents: {unmatched_dates}")
-
-        # Precompute LocationID by merging with Dim_Location
-        accidents_with_location = accidents_with_date.merge(
-            dim_location_df[['LocationID', 'LocationName']],
-            left_on='Location',
-            right_on='LocationName',
-            how='left'
+            logging.warning("Unmatched dates in Fact_Accidents: %s", unmatched_dates)
+
+        # Drop duplicate AccidentIDs, keeping the first occurrence
+        accidents_with_location = accidents_with_location.drop_duplicates(subset='AccidentID', keep='first')
+
+        # Skip rows with missing critical data
+        missing_keys = accidents_with_location['ReportedAt'].isnull() | accidents_with_location['Location'].isnull()
+        if missing_keys.any():
+            logging.warning("Skipping rows with AccidentID %s due to missing ReportedAt or Location.", accidents_with_location.loc[missing_keys, 'AccidentID'].tolist())
+        # Every remaining row matched both dimensions, so the keys can be restored to integers
+        accidents_with_location = accidents_with_location[~missing_keys].astype({'DateID': 'int32', 'LocationID': 'int32'})
+
+        # Match RoadConditionID by Location and timestamp proximity in a single as-of join
+        # (both sides must be sorted on the timestamp and free of missing keys)
+        road_conditions_sorted = (
+            road_conditions_df[['ConditionID', 'Location', 'RecordedAt']]
+            .dropna(subset=['Location', 'RecordedAt'])
+            .sort_values('RecordedAt')
+        )
+        fact_accidents_df = pd.merge_asof(
+            accidents_with_location.sort_values('ReportedAt'),
+            road_conditions_sorted,
+            left_on='ReportedAt',
+            right_on='RecordedAt',
+            by='Location',
+            direction='nearest'
+        ).sort_values('AccidentID', ignore_index=True)
+
+        # Pre-generate the random VehicleIDs and fallback RoadConditionIDs from the fixed seed,
+        # drawing from the keys actually loaded so every ID satisfies its foreign key
+        rng = np.random.default_rng(RANDOM_SEED)
+        vehicle_ids = draw_dimension_keys(rng, dim_vehicle_df['VehicleID'], len(fact_accidents_df))
+        fallback_road_condition_ids = draw_dimension_keys(rng, dim_road_condition_df['RoadConditionID'], len(fact_accidents_df))
+
+        # Assign a random VehicleID as per pseudocode
+        fact_accidents_df['VehicleID'] = vehicle_ids
+
+        # If no road condition exists for the location, or the matched one was dropped from
+        # Dim_RoadCondition for missing data, assign a random RoadConditionID
+        unmatched_conditions = ~fact_accidents_df['ConditionID'].isin(dim_road_condition_df['RoadConditionID'])
+        if unmatched_conditions.any():
+            logging.info("No road condition found for %d accidents, using random RoadConditionIDs.", unmatched_conditions.sum())
+        fact_accidents_df['RoadConditionID'] = fact_accidents_df['ConditionID'].astype('Int32').where(
+            ~unmatched_conditions,
+            fallback_road_condition_ids
         )
 
-        # Group by AccidentID to avoid duplicates, taking the first match
-        accidents_with_location = accidents_with_location.groupby('AccidentID').first().reset_index()
-
-        # Build Fact_Accidents table row by row
-        fact_accidents_data = []
-        for _, row in accidents_with_location.iterrows():
-            # Skip rows with missing critical data
-            if pd.isnull(row['ReportedAt']) or pd.isnull(row['Location']):
-                logging.warning(f"Skipping row with AccidentID {row['AccidentID']} due to missing ReportedAt or Location.")
-                continue
-
-            # Extract foreign keys
-            date_id = row['DateID']
-            location_id = row['LocationID']
-            vehicle_id = random.randint(1, 200)  # Assign a random VehicleID as per pseudocode
-
-            # Match RoadConditionID by Location and timestamp proximity
-            reported_at = row['ReportedAt']
-            accident_location = row['Location']
-            # Filter road conditions for the same location
-            matching_conditions = road_conditions_df[road_conditions_df['Location'] == accident_location]
-            if not matching_conditions.empty:
-                # Find the road condition with the closest timestamp
-                time_diffs = (matching_conditions['RecordedAt'] - reported_at).abs()
-                closest_match = matching_conditions.iloc[time_diffs.idxmin()]
-                road_condition_id = closest_match['ConditionID']
-            else:
-                # If no match, assign a random RoadConditionID
-                road_condition_id = random.randint(1, 100)
-                logging.info(f"No road condition found for date {reported_at.date()} at location {accident_location}, using random RoadConditionID: {road_condition_id}")
-
-            # Map Severity to SeverityScore
-            severity_map = {'Minor': 1, 'Moderate': 2, 'Severe': 3}
-            severity_score = severity_map.get(row['Severity'], 1)  # Default to 1 if Severity is invalid
-
-            # Append the row to the fact table data
-            fact_accidents_data.append({
-                'AccidentID': row['AccidentID'],
-                'DateID': date_id,
-                'LocationID': location_id,
-                'VehicleID': vehicle_id,
-                'RoadConditionID': road_condition_id,
-                'VehiclesInvolved': row['VehiclesInvolved'],
-                'SeverityScore': severity_score
-            })
-
-        # Convert the list of dictionaries to a DataFrame and load into Fact_Accidents
-        fact_accidents_df = pd.DataFrame(fact_accidents_data)
-        fact_accidents_df.to_sql('Fact_Accidents', engine, if_exists='replace', index=False)
+        # Map Severity to SeverityScore from the category codes, defaulting to 1 if Severity is invalid
+        fact_accidents_df['SeverityScore'] = (fact_accidents_df['Severity'].cat.codes + 1).clip(lower=1).astype('int8')
+
+        # Keep only the fact table columns
+        fact_columns = [
+            'AccidentID', 'DateID', 'LocationID', 'VehicleID',
+            'RoadConditionID', 'VehiclesInvolved', 'SeverityScore'
+        ]
+        # VehiclesInvolved may be missing in the source, so use the nullable integer type
+        fact_accidents_df = fact_accidents_df[fact_columns].astype({'AccidentID': 'int32', 'VehiclesInvolved': 'Int16'})
+
+        # Plain Python values for the DB-API driver, with missing values written as NULL
+        fact_rows = list(fact_accidents_df.astype(object).where(fact_accidents_df.notna(), None).itertuples(index=False, name=None))
+        # Load into the Fact_Accidents table defined in create_tables with a single prepared INSERT
+        # (skipped when every accident was filtered out, as an empty parameter list would run it once unbound)
+        if fact_rows:
+            conn.exec_driver_sql(
+                f"INSERT INTO Fact_Accidents ({', '.join(fact_columns)}) VALUES ({', '.join('?' * len(fact_columns))})",
+                fact_rows
+            )
         logging.info("Populated Fact_Accidents with %d rows.", len(fact_accidents_df))
     except Exception as e:
-        logging.error(f"Error populating Fact_Accidents: {str(e)}")
+        logging.error("Error populating Fact_Accidents: %s", e)
         raise
 
 # --- Validation ---
@@ -382,16 +523,17 @@ def validate_database(engine):
     """
     try:
         with engine.connect() as conn:
-            # Check the row count for each table
-            for table in ['Dim_Location', 'Dim_Vehicle', 'Dim_RoadCondition', 'Dim_Date', 'Fact_Accidents']:
-                count = conn.execute(text(f"SELECT COUNT(*) FROM {table}")).fetchone()[0]
-                logging.info(f"{table}: {count} rows")
+            # Check the row count for each table with a single UNION ALL statement
+            tables = ['Dim_Location', 'Dim_Vehicle', 'Dim_RoadCondition', 'Dim_Date', 'Fact_Accidents']
+            count_query = " UNION ALL ".join(f"SELECT '{table}', COUNT(*) FROM {table}" for table in tables)
+            for table, count in conn.execute(text(count_query)).fetchall():
+                logging.info("%s: %d rows", table, count)
             
             # Sample 10 rows from Fact_Accidents for verification
             sample = pd.read_sql("SELECT * FROM Fact_Accidents LIMIT 10", conn)
             logging.info("\nSample from Fact_Accidents:\n%s", sample.to_string())
     except Exception as e:
-        logging.error(f"Error during validation: {str(e)}")
+        logging.error("Error during validation: %s", e)
         raise
 
 # --- Main ETL Pipeline ---
@@ -403,10 +545,10 @@ def run_etl_pipeline():
     Steps:
         1. Load data from Excel file.
         2. Convert timestamps to datetime.
-        3. Create database tables.
-        4. Populate dimension tables.
-        5. Populate fact table.
-        6. Validate the database.
+        3. Build dimension tables concurrently.
+        4. Recreate the tables, populate them and build indexes in a single transaction.
+        5. Validate the database.
+        6. Display table snapshots.
     """
     # Define input file and required sheets
     excel_file = 'Traffic.xlsx'
@@ -424,23 +566,48 @@ def run_etl_pipeline():
 
     # Step 3: Create database connection using SQLAlchemy
     engine = create_engine('sqlite:///accident_data_warehouse.db', echo=False)
+    configure_sqlite(engine)
     logging.info("Connected to SQLite database.")
 
-    # Step 4: Create the star schema tables
-    create_tables(engine)
-
-    # Step 5: Populate dimension tables
-    dim_location_df = populate_dim_location(accidents_df, engine)
-    dim_vehicle_df = populate_dim_vehicle(vehicles_df, engine)
-    dim_road_condition_df = populate_dim_road_condition(road_conditions_df, engine)
-    dim_date_df = populate_dim_date(accidents_df, engine)
+    # Step 4: Build the independent dimension tables concurrently
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        dim_location_future = executor.submit(build_dim_location, accidents_df)
+        dim_vehicle_future = executor.submit(build_dim_vehicle, vehicles_df)
+        dim_road_condition_future = executor.submit(build_dim_road_condition, road_conditions_df)
+        dim_date_future = executor.submit(build_dim_date, accidents_df)
+        dim_location_df = dim_location_future.result()
+        dim_vehicle_df = dim_vehicle_future.result()
+        dim_road_condition_df = dim_road_condition_future.result()
+        dim_date_df = dim_date_future.result()
+
+    # Steps 5-8: Rebuild the warehouse in a single transaction so SQLite commits once and
+    # a failed load rolls back to the previous tables
+    # (SQLite allows a single writer, so the inserts themselves run sequentially)
+    with engine.begin() as conn:
+        # Step 5: Recreate the star schema tables
+        create_tables(conn)
+
+        # Step 6: Populate dimension tables
+        load_table(dim_location_df, 'Dim_Location', conn)
+        load_table(dim_vehicle_df, 'Dim_Vehicle', conn)
+        load_table(dim_road_condition_df, 'Dim_RoadCondition', conn)
+        load_table(dim_date_df, 'Dim_Date', conn)
+
+        # Step 7: Populate the fact table
+        populate_fact_accidents(
+            accidents_df, dim_location_df, dim_date_df, dim_vehicle_df, dim_road_condition_df,
+            road_conditions_df, conn
+        )
 
-    # Step 6: Populate the fact table
-    populate_fact_accidents(accidents_df, dim_location_df, dim_date_df, road_conditions_df, engine)
+        # Step 8: Build secondary indexes now that the bulk load is done
+        create_indexes(conn)
 
-    # Step 7: Validate the database
+    # Step 9: Validate the database
     validate_database(engine)
 
+    # Step 10: Display snapshots of every table using the same engine
+    generate_snapshots(engine)
+
     logging.info("ETL pipeline completed successfully.")
 
 # --- Entry Point ---
@@ -453,5 +620,5 @@ if __name__ == "__main__":
     try:
         run_etl_pipeline()
     except Exception as e:
-        logging.error(f"ETL pipeline failed: {str(e)}")
+        logging.error("ETL pipeline failed: %s", e)
         raise
\ No newline at end of file
@@ -1,14 +1,24 @@
 import pandas as pd
 from sqlalchemy import create_engine
-
-# Connect to the SQLite database
-engine = create_engine('sqlite:///accident_data_warehouse.db', echo=False)
+from sqlalchemy.sql import text
 
 # List of tables to query
 tables = ['Dim_Location', 'Dim_Vehicle', 'Dim_RoadCondition', 'Dim_Date', 'Fact_Accidents']
 
-# Query and display the first 10 rows of each table
-for table in tables:
-    print(f"\n--- {table} (First 10 Rows) ---")
-    df = pd.read_sql(f"SELECT * FROM {table} LIMIT 10", engine)
-    print(df.to_string(index=False))
\ No newline at end of file
+def generate_snapshots(engine):
+    """
+    Query and display the first 10 rows of each table over a single connection.
+
+    Args:
+        engine (sqlalchemy.engine.Engine): SQLAlchemy engine for database connection.
+    """
+    with engine.connect() as conn:
+        for table in tables:
+            print(f"\n--- {table} (First 10 Rows) ---")
+            df = pd.read_sql_query(text(f"SELECT * FROM {table} LIMIT 10"), conn)
+            print(df.to_string(index=False))
+
+if __name__ == "__main__":
+    # Connect to the SQLite database
+    engine = create_engine('sqlite:///accident_data_warehouse.db', echo=False)
+    generate_snapshots(engine)
\ No newline at end of file